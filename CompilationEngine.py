@@ -1,13 +1,30 @@
 from JackTokenizer import JackTokenizer
+from XMLWriter import XMLWriter
 
 class CompilationEngine:
-    def __init__(self, input_file_path, output_path):
+    # XML tag used for each token type reported by the tokenizer
+    TOKEN_KINDS = {
+        'KEYWORD': 'keyword',
+        'SYMBOL': 'symbol',
+        'IDENTIFIER': 'identifier',
+        'INT_CONST': 'integerConstant',
+        'STRING_CONST': 'stringConstant',
+    }
+
+    def __init__(self, input_file_path, output_path=None, handler=None, compact=False):
         """
-        Initialize the compilation engine
+        Initialize the compilation engine.
+        The compile_* methods report the parse structure as a stream of events on the
+        handler: start(tag) and end(tag) around every nested structure, and
+        token(kind, value) for every terminal. When no handler is given, the events
+        are written to output_path as XML.
         :param input_file_path: Path to the input .jack file
         :param output_path: Path to the output .xml file
+        :param handler: Object receiving start/token/end events instead of the XML writer
+        :param compact: Write the XML without indentation (only valid without a handler)
         """
-        self.indent_level = 0
+        if handler is not None and compact:
+            raise Exception("compact only applies to the XML output, not to a custom handler")
         try:
             self.tokenizer = JackTokenizer(input_file_path)
             # If no tokens, raise an error
@@ -18,56 +35,136 @@ class CompilationEngine:
         except Exception as e:
             raise Exception(f"Failed to initialize tokenizer: {str(e)}")
 
-        try:
-            self.output = open(output_path, "w+")
-        except Exception as e:
-            raise Exception(f"Failed to open output file {output_path}: {str(e)}")
+        if handler is None:
+            try:
+                handler = XMLWriter(output_path, compact)
+            except Exception as e:
+                raise Exception(f"Failed to open output file {output_path}: {str(e)}")
+        self.handler = handler
+        self.class_index = None  # filled in by skim_class
 
     def close(self):
-        """Explicitly close the output file"""
-        if hasattr(self, 'output') and self.output:
-            self.output.flush()
-            self.output.close()
-
-    def write_element(self, tag, value):
-        """Writes an XML element with the given tag and value."""
-        indent = '  ' * self.indent_level
-        self.output.write(f'{indent}<{tag}> {value} </{tag}>\n')
-        self.output.flush()  # Force write to disk
-
-    def write_xml_tag(self, tag):
-        """Writes an XML tag, handling indentation for nested structures."""
-        if tag.startswith('/'):  # closing tag
-            self.indent_level -= 1
-            indent = '  ' * self.indent_level
-            self.output.write(f'{indent}<{tag}>\n')
-        else:
-            indent = '  ' * self.indent_level
-            self.output.write(f'{indent}<{tag}>\n')
-            self.indent_level += 1
-        self.output.flush()
+        """Explicitly close the handler (the output file, when writing XML)"""
+        if hasattr(self.handler, 'close'):
+            self.handler.close()
 
     def write_current_token(self):
-        """Writes the current token to the output file with appropriate XML tags."""
+        """Reports the current token to the handler, tagged with its kind."""
         token_type = self.tokenizer.token_type()
         if token_type == 'KEYWORD':
-            self.write_element('keyword', self.tokenizer.keyWord())
+            value = self.tokenizer.keyWord()
         elif token_type == 'SYMBOL':
-            symbol = self.tokenizer.symbol()
-            # Escape special XML characters
-            if symbol == '<':
-                symbol = '&lt;'
-            elif symbol == '>':
-                symbol = '&gt;'
-            elif symbol == '&':
-                symbol = '&amp;'
-            self.write_element('symbol', symbol)
+            value = self.tokenizer.symbol()
         elif token_type == 'IDENTIFIER':
-            self.write_element('identifier', self.tokenizer.identifier())
+            value = self.tokenizer.identifier()
         elif token_type == 'INT_CONST':
-            self.write_element('integerConstant', str(self.tokenizer.intVal()))
+            value = self.tokenizer.intVal()
         elif token_type == 'STRING_CONST':
-            self.write_element('stringConstant', self.tokenizer.stringVal())
+            value = self.tokenizer.stringVal()
+        else:
+            return
+        self.handler.token(self.TOKEN_KINDS[token_type], value)
+
+    # ------------------------------
+    # Skimming
+    # ------------------------------
+
+    def skim_class(self):
+        """
+        Records the structure of the class without parsing any subroutine body.
+        Each body is located by matching braces over the token list, so the
+        subroutines can later be compiled on demand and independently of each other
+        with compile_subroutine_at / compile_subroutine_body_at.
+        No events are reported while skimming.
+        Skimming walks the token list, so the whole file is still tokenized when the
+        engine is constructed; only the parsing of the bodies is skipped.
+        :return: A dict with the class 'name', its 'class_vars' as (kind, type, name)
+                 tuples, and its 'subroutines' by name. Each subroutine is a dict with
+                 'kind', 'type', 'name', 'parameters' as (type, name) tuples, 'start'
+                 (index of its first token) and 'body' (indexes of its '{' and '}')
+        """
+        tokens = self.tokenizer.listOfTokens
+        end = len(tokens)
+        self.class_index = {'name': None, 'class_vars': [], 'subroutines': {}}
+        if not tokens or tokens[0] != 'class':
+            return self.class_index
+        self.class_index['name'] = self.skim_token(1)
+        if self.skim_token(2) != '{':
+            raise Exception(f"Expected '{{' after class {tokens[1]}, found '{tokens[2]}'")
+
+        i = 3  # first token after 'class' name '{'
+        while i < end:
+            token = tokens[i]
+            if token in ('static', 'field'):
+                # kind type varName (',' varName)* ';'
+                var_type = self.skim_token(i + 1)
+                i += 2
+                while self.skim_token(i) != ';':
+                    if tokens[i] != ',':
+                        self.class_index['class_vars'].append((token, var_type, tokens[i]))
+                    i += 1
+                i += 1
+            elif token in ('constructor', 'function', 'method'):
+                start = i
+                subroutine = {'kind': token, 'type': self.skim_token(i + 1), 'name': self.skim_token(i + 2),
+                              'parameters': [], 'start': start}
+                if self.skim_token(i + 3) != '(':
+                    raise Exception(f"Expected '(' after subroutine {subroutine['name']}, found '{tokens[i + 3]}'")
+                # '(' (type varName (',' type varName)*)? ')'
+                i += 4
+                while self.skim_token(i) != ')':
+                    if tokens[i] == ',':
+                        i += 1
+                    subroutine['parameters'].append((self.skim_token(i), self.skim_token(i + 1)))
+                    i += 2
+                i += 1
+                if self.skim_token(i) != '{':
+                    raise Exception(f"Expected '{{' to open the body of {subroutine['name']}, found '{tokens[i]}'")
+                body_start = i
+                i = self.matching_brace(body_start)
+                subroutine['body'] = (body_start, i)
+                self.class_index['subroutines'][subroutine['name']] = subroutine
+                i += 1
+            else:
+                break
+        return self.class_index
+
+    def skim_token(self, index):
+        """Returns the token at the given index, failing clearly on truncated input."""
+        if index >= len(self.tokenizer.listOfTokens):
+            raise Exception(f"Unexpected end of input in {self.tokenizer.input_file} while skimming")
+        return self.tokenizer.listOfTokens[index]
+
+    def matching_brace(self, index):
+        """Returns the index of the '}' closing the '{' at the given token index."""
+        tokens = self.tokenizer.listOfTokens
+        depth = 0
+        for i in range(index, len(tokens)):
+            if tokens[i] == '{':
+                depth += 1
+            elif tokens[i] == '}':
+                depth -= 1
+                if depth == 0:
+                    return i
+        raise Exception(f"Unbalanced braces starting at token {index}")
+
+    def skimmed_subroutine(self, name):
+        """Returns the skim record of a subroutine, skimming the class first if needed."""
+        if self.class_index is None:
+            self.skim_class()
+        if name not in self.class_index['subroutines']:
+            raise Exception(f"Class {self.class_index['name']} has no subroutine {name}")
+        return self.class_index['subroutines'][name]
+
+    def compile_subroutine_at(self, name):
+        """Compiles a single subroutine declaration found by skim_class."""
+        self.tokenizer.seek(self.skimmed_subroutine(name)['start'])
+        self.compile_subroutine()
+
+    def compile_subroutine_body_at(self, name):
+        """Compiles only the body of a subroutine found by skim_class."""
+        self.tokenizer.seek(self.skimmed_subroutine(name)['body'][0])
+        self.compile_subroutine_body()
 
     # ------------------------------
     # Compilation Methods
@@ -77,7 +174,7 @@ class CompilationEngine:
         """Compiles a complete class."""
         # Expect the current token to be 'class'
         if self.tokenizer.token_type() == 'KEYWORD' and self.tokenizer.keyWord() == 'class':
-            self.write_xml_tag('class')
+            self.handler.start('class')
             # Write 'class'
             self.write_current_token()
             self.tokenizer.advance()
@@ -105,11 +202,11 @@ class CompilationEngine:
                     if self.tokenizer.token_type() == 'SYMBOL' and self.tokenizer.symbol() == '}':
                         self.write_current_token()
 
-            self.write_xml_tag('/class')
+            self.handler.end('class')
 
     def compile_class_var_dec(self):
         """Compiles a static variable declaration or field declaration."""
-        self.write_xml_tag('classVarDec')
+        self.handler.start('classVarDec')
 
         # 'static' or 'field'
         self.write_current_token()
@@ -135,11 +232,11 @@ class CompilationEngine:
             self.write_current_token()
             self.tokenizer.advance()
 
-        self.write_xml_tag('/classVarDec')
+        self.handler.end('classVarDec')
 
     def compile_subroutine(self):
         """Compiles a complete subroutine (constructor, function, or method)."""
-        self.write_xml_tag('subroutineDec')
+        self.handler.start('subroutineDec')
 
         # constructor / function / method
         self.write_current_token()
@@ -165,11 +262,11 @@ class CompilationEngine:
         # subroutine body
         self.compile_subroutine_body()
 
-        self.write_xml_tag('/subroutineDec')
+        self.handler.end('subroutineDec')
 
     def compile_parameter_list(self):
         """Compiles a (possibly empty) parameter list."""
-        self.write_xml_tag('parameterList')
+        self.handler.start('parameterList')
 
         while not (self.tokenizer.token_type() == 'SYMBOL' and self.tokenizer.symbol() == ')'):
             self.write_current_token()
@@ -179,11 +276,11 @@ class CompilationEngine:
                 self.write_current_token()
                 self.tokenizer.advance()
 
-        self.write_xml_tag('/parameterList')
+        self.handler.end('parameterList')
 
     def compile_subroutine_body(self):
         """Compiles a subroutine body: { varDec* statements }"""
-        self.write_xml_tag('subroutineBody')
+        self.handler.start('subroutineBody')
 
         # Expect '{'
         if self.tokenizer.token_type() == 'SYMBOL' and self.tokenizer.symbol() == '{':
@@ -202,11 +299,11 @@ class CompilationEngine:
                 self.write_current_token()
                 self.tokenizer.advance()
 
-        self.write_xml_tag('/subroutineBody')
+        self.handler.end('subroutineBody')
 
     def compile_var_dec(self):
         """Compiles a var declaration: var type varName (',' varName)* ';'"""
-        self.write_xml_tag('varDec')
+        self.handler.start('varDec')
 
         # 'var'
         self.write_current_token()
@@ -232,11 +329,11 @@ class CompilationEngine:
             self.write_current_token()
             self.tokenizer.advance()
 
-        self.write_xml_tag('/varDec')
+        self.handler.end('varDec')
 
     def compile_statements(self):
         """Compiles a sequence of statements."""
-        self.write_xml_tag('statements')
+        self.handler.start('statements')
 
         while self.tokenizer.token_type() == 'KEYWORD':
             kw = self.tokenizer.keyWord()
@@ -253,11 +350,11 @@ class CompilationEngine:
             else:
                 break
 
-        self.write_xml_tag('/statements')
+        self.handler.end('statements')
 
     def compile_let(self):
         """Compiles a let statement: let varName ('[' expression ']')? = expression ;"""
-        self.write_xml_tag('letStatement')
+        self.handler.start('letStatement')
 
         # 'let'
         self.write_current_token()
@@ -289,11 +386,11 @@ class CompilationEngine:
             self.write_current_token()
             self.tokenizer.advance()
 
-        self.write_xml_tag('/letStatement')
+        self.handler.end('letStatement')
 
     def compile_if(self):
         """Compiles an if statement: if ( expression ) { statements } (else { statements })?"""
-        self.write_xml_tag('ifStatement')
+        self.handler.start('ifStatement')
 
         # 'if'
         self.write_current_token()
@@ -343,11 +440,11 @@ class CompilationEngine:
                 self.write_current_token()
                 self.tokenizer.advance()
 
-        self.write_xml_tag('/ifStatement')
+        self.handler.end('ifStatement')
 
     def compile_while(self):
         """Compiles a while statement: while ( expression ) { statements }"""
-        self.write_xml_tag('whileStatement')
+        self.handler.start('whileStatement')
 
         # 'while'
         self.write_current_token()
@@ -379,11 +476,11 @@ class CompilationEngine:
             self.write_current_token()
             self.tokenizer.advance()
 
-        self.write_xml_tag('/whileStatement')
+        self.handler.end('whileStatement')
 
     def compile_do(self):
         """Compiles a do statement: do subroutineCall ;"""
-        self.write_xml_tag('doStatement')
+        self.handler.start('doStatement')
 
         # 'do'
         self.write_current_token()
@@ -416,11 +513,11 @@ class CompilationEngine:
             self.write_current_token()
             self.tokenizer.advance()
 
-        self.write_xml_tag('/doStatement')
+        self.handler.end('doStatement')
 
     def compile_return(self):
         """Compiles a return statement: return expression? ;"""
-        self.write_xml_tag('returnStatement')
+        self.handler.start('returnStatement')
 
         # 'return'
         self.write_current_token()
@@ -435,11 +532,11 @@ class CompilationEngine:
             self.write_current_token()
             self.tokenizer.advance()
 
-        self.write_xml_tag('/returnStatement')
+        self.handler.end('returnStatement')
 
     def compile_expression(self):
         """Compiles an expression: term (op term)*"""
-        self.write_xml_tag('expression')
+        self.handler.start('expression')
         self.compile_term()
 
         # while next token is an operator, keep compiling terms
@@ -449,11 +546,11 @@ class CompilationEngine:
             self.tokenizer.advance()
             self.compile_term()
 
-        self.write_xml_tag('/expression')
+        self.handler.end('expression')
 
     def compile_term(self):
         """Compiles a term. This routine is slightly complex due to variety of term types."""
-        self.write_xml_tag('term')
+        self.handler.start('term')
 
         token_type = self.tokenizer.token_type()
 
@@ -498,7 +595,7 @@ class CompilationEngine:
                 self.tokenizer.advance()
                 self.compile_term()
 
-        self.write_xml_tag('/term')
+        self.handler.end('term')
 
     def compile_subroutine_call_continuation(self):
         """
@@ -524,7 +621,7 @@ class CompilationEngine:
 
     def compile_expression_list(self):
         """Compiles a (possibly empty) comma-separated list of expressions."""
-        self.write_xml_tag('expressionList')
+        self.handler.start('expressionList')
         # If next token is not ')', compile first expression
         if not (self.tokenizer.token_type() == 'SYMBOL' and self.tokenizer.symbol() == ')'):
             self.compile_expression()
@@ -535,4 +632,4 @@ class CompilationEngine:
                 self.tokenizer.advance()
                 self.compile_expression()
 
-        self.write_xml_tag('/expressionList')
\ No newline at end of file
+        self.handler.end('expressionList')
\ No newline at end of file
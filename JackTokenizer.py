@@ -1,5 +1,16 @@
 import re
 
+KEYWORDS = frozenset({
+    'class', 'constructor', 'function', 'method', 'field', 'static',
+    'var', 'int', 'char', 'boolean', 'void', 'true', 'false', 'null',
+    'this', 'let', 'do', 'if', 'else', 'while', 'return'
+})
+SYMBOLS = frozenset('{}()[].,;+-*/&|<>=~')
+# An identifier, keyword, or integer runs up to whitespace, a symbol or a quote
+WORD = re.compile(r'[^\s{}()\[\].,;+\-*/&|<>=~"]+')
+# A string constant up to its closing quote, a single symbol, or a word
+TOKEN = re.compile(r'"[^"]*"?|[{}()\[\].,;+\-*/&|<>=~]|' + WORD.pattern)
+
 class JackTokenizer:
     def __init__(self, input_file):
         self.input_file = input_file
@@ -45,67 +56,14 @@ class JackTokenizer:
 
     def tokenize(self, text):
         """
-        Goes through the cleaned text character-by-character, splitting into tokens:
+        Goes through the cleaned text, splitting into tokens:
         - Symbols
-        - String constants in quotes
+        - String constants in quotes (an unterminated one runs to the end of the text)
         - Integers, keywords, and identifiers
+        Whitespace only separates tokens. The whole text is split by one compiled
+        regular expression, so the running time stays linear in the size of the input.
         """
-        symbols = set('{}()[].,;+-*/&|<>=~')
-        tokens = []
-
-        current_token = ''
-        inside_string = False
-
-        i = 0
-        while i < len(text):
-            char = text[i]
-
-            if inside_string:
-                # We are inside a string constant
-                current_token += char
-                if char == '"':
-                    # End of string constant
-                    tokens.append(current_token)
-                    current_token = ''
-                    inside_string = False
-                i += 1
-            else:
-                # Not inside a string
-                if char.isspace():
-                    # Whitespace -> end the current token (if any)
-                    if current_token:
-                        tokens.append(current_token)
-                        current_token = ''
-                    i += 1
-
-                elif char == '"':
-                    # Start of a string constant
-                    # If there's a token building, first finalize it
-                    if current_token:
-                        tokens.append(current_token)
-                        current_token = ''
-                    current_token = '"'
-                    inside_string = True
-                    i += 1
-
-                elif char in symbols:
-                    # Symbol is a separate token
-                    if current_token:
-                        tokens.append(current_token)
-                        current_token = ''
-                    tokens.append(char)  # the symbol itself
-                    i += 1
-
-                else:
-                    # Building up an identifier, keyword, or integer
-                    current_token += char
-                    i += 1
-
-        # If there's any leftover token after the loop
-        if current_token:
-            tokens.append(current_token)
-
-        return tokens
+        return TOKEN.findall(text)
 
     def hasMoreTokens(self):
         """
@@ -121,6 +79,13 @@ class JackTokenizer:
             self.currentTokenIndex += 1
             self.currentToken = self.listOfTokens[self.currentTokenIndex]
 
+    def seek(self, index):
+        """
+        Moves to the token at the given position of the token list.
+        """
+        self.currentTokenIndex = index
+        self.currentToken = self.listOfTokens[index]
+
     def token_type(self):
         """
         Returns: 'KEYWORD', 'SYMBOL', 'IDENTIFIER', 'INT_CONST', or 'STRING_CONST'
@@ -128,17 +93,10 @@ class JackTokenizer:
         if self.currentToken is None:
             return None
 
-        keywords = {
-            'class', 'constructor', 'function', 'method', 'field', 'static',
-            'var', 'int', 'char', 'boolean', 'void', 'true', 'false', 'null',
-            'this', 'let', 'do', 'if', 'else', 'while', 'return'
-        }
-        symbols = set('{}()[].,;+-*/&|<>=~')
-
         token = self.currentToken
-        if token in keywords:
+        if token in KEYWORDS:
             return 'KEYWORD'
-        elif token in symbols:
+        elif token in SYMBOLS:
             return 'SYMBOL'
         elif token.startswith('"') and token.endswith('"'):
             return 'STRING_CONST'
@@ -0,0 +1,480 @@
+import os
+import sys
+from collections import Counter
+from VMLinker import VMBundle
+
+# Pre-decoded operation codes
+PUSH_CONST, PUSH_SEG, PUSH_ADDR, POP_SEG, POP_ADDR = range(5)
+ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT = range(5, 14)
+GOTO, IF_GOTO, CALL, CALL_OS, FUNCTION, RETURN = range(14, 20)
+
+ARITHMETIC = {'add': ADD, 'sub': SUB, 'neg': NEG, 'eq': EQ, 'gt': GT,
+              'lt': LT, 'and': AND, 'or': OR, 'not': NOT}
+# RAM slot holding the base address of each pointer-based segment
+SEGMENT_BASES = {'local': 1, 'argument': 2, 'this': 3, 'that': 4}
+
+# Estimated Hack instructions per VM command, following the standard VM translator
+PUSH_CYCLES = {'constant': 7, 'local': 10, 'argument': 10, 'this': 10, 'that': 10,
+               'temp': 7, 'pointer': 7, 'static': 7}
+POP_CYCLES = {'local': 14, 'argument': 14, 'this': 14, 'that': 14,
+              'temp': 6, 'pointer': 6, 'static': 6}
+OP_CYCLES = {ADD: 5, SUB: 5, AND: 5, OR: 5, NEG: 3, NOT: 3, EQ: 14, GT: 14, LT: 14,
+             GOTO: 2, IF_GOTO: 5, CALL: 44, CALL_OS: 44, RETURN: 40}
+
+STACK_BASE = 256
+HEAP_BASE = 2048
+HEAP_END = 16384
+STATIC_BASE = 16
+STATIC_END = 256
+
+
+def wrap(value):
+    """Wraps an integer into the signed 16-bit range of the Hack platform."""
+    return ((value + 32768) & 0xFFFF) - 32768
+
+
+class VMHalt(Exception):
+    """Raised by the OS stub when the program calls Sys.halt."""
+
+
+class VMInterpreter:
+    def __init__(self):
+        """
+        Creates an empty interpreter.
+        Load .vm files with load(), then execute them with run().
+        """
+        self.functions = {}  # function name -> list of (command, arguments) in source order
+        self.reset()
+        self.os = {
+            'Math.multiply': lambda a, b: wrap(a * b),
+            'Math.divide': self.os_divide,
+            'Math.min': min,
+            'Math.max': max,
+            'Math.abs': lambda a: wrap(abs(a)),
+            'Math.sqrt': lambda a: int(max(a, 0) ** 0.5),
+            'Memory.alloc': self.os_alloc,
+            'Memory.deAlloc': lambda a: 0,
+            'Memory.peek': lambda a: self.ram[a],
+            'Memory.poke': self.os_poke,
+            'Array.new': self.os_alloc,
+            'Array.dispose': lambda a: 0,
+            'String.new': self.os_string_new,
+            'String.dispose': lambda s: 0,
+            'String.length': lambda s: self.ram[s + 1],
+            'String.charAt': lambda s, i: self.ram[s + 2 + i],
+            'String.setCharAt': self.os_string_set_char_at,
+            'String.appendChar': self.os_string_append_char,
+            'String.eraseLastChar': self.os_string_erase_last_char,
+            'String.intValue': self.os_string_int_value,
+            'String.setInt': self.os_string_set_int,
+            'String.newLine': lambda: 128,
+            'String.backSpace': lambda: 129,
+            'String.doubleQuote': lambda: 34,
+            'Output.printChar': self.os_print_char,
+            'Output.printString': self.os_print_string,
+            'Output.printInt': lambda i: self.os_print_text(str(i)),
+            'Output.println': lambda: self.os_print_text('\n'),
+            'Output.backSpace': lambda: 0,
+            'Output.moveCursor': lambda i, j: 0,
+            'Keyboard.keyPressed': lambda: 0,
+            'Sys.halt': self.os_halt,
+            'Sys.error': self.os_error,
+            'Sys.wait': lambda ms: 0,
+        }
+
+    def reset(self):
+        """Clears the memory, the heap and the captured output of a previous run."""
+        self.ram = [0] * 32768
+        self.output = []
+        self.heap_pointer = HEAP_BASE
+        self.allocations = 0
+        self.allocated_words = 0
+
+    # ------------------------------
+    # Loading
+    # ------------------------------
+
+    def load(self, path):
+        """
+        Loads a .vm file, every .vm file in a directory, or a linked .vmb bundle.
+        :param path: Path to a .vm file, a directory of .vm files or a bundle
+        """
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.vm'):
+                    self.load(os.path.join(path, name))
+            return
+        if path.endswith('.vmb'):
+            bundle = VMBundle(path)
+            try:
+                self.load_source(bundle.source())
+            finally:
+                bundle.close()
+            return
+        with open(path, 'r') as f:
+            self.load_source(f.read())
+
+    def load_source(self, text):
+        """
+        Parses VM code and adds its functions to the program.
+        :param text: The VM commands, one per line
+        """
+        current = None
+        for line in text.split('\n'):
+            line = line.split('//')[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if parts[0] == 'function':
+                current = []
+                self.functions[parts[1]] = current
+            elif current is None:
+                raise Exception(f"Command outside of a function: {line}")
+            current.append((parts[0], parts[1:]))
+
+    def decode(self):
+        """
+        Translates the loaded functions into one flat array of (op, a, b) tuples.
+        Labels, function names and segments are all resolved here, so the execution
+        loop never looks at strings.
+        :return: (code, costs, entry points by function name)
+        """
+        entries = {}
+        labels = {}
+        pc = 0
+        # First pass: addresses of functions and labels (labels are scoped to their function)
+        for name, commands in self.functions.items():
+            entries[name] = pc
+            for command, args in commands:
+                if command == 'label':
+                    if (name, args[0]) in labels:
+                        raise Exception(f"Label {args[0]} is defined twice in {name}")
+                    labels[(name, args[0])] = pc
+                else:
+                    pc += 1
+
+        statics = {}
+        code = []
+        costs = []
+        for name, commands in self.functions.items():
+            class_name = name.split('.')[0]
+            for command, args in commands:
+                if command == 'label':
+                    continue
+                if command in ('push', 'pop'):
+                    segment, index = args[0], int(args[1])
+                    if command == 'push' and segment == 'constant':
+                        instruction = (PUSH_CONST, index, 0)
+                    elif segment in SEGMENT_BASES:
+                        op = PUSH_SEG if command == 'push' else POP_SEG
+                        instruction = (op, SEGMENT_BASES[segment], index)
+                    else:
+                        address = self.address_of(segment, index, class_name, statics)
+                        op = PUSH_ADDR if command == 'push' else POP_ADDR
+                        instruction = (op, address, 0)
+                    cost = (PUSH_CYCLES if command == 'push' else POP_CYCLES)[segment]
+                elif command in ARITHMETIC:
+                    instruction = (ARITHMETIC[command], 0, 0)
+                    cost = OP_CYCLES[instruction[0]]
+                elif command in ('goto', 'if-goto'):
+                    if (name, args[0]) not in labels:
+                        raise Exception(f"Unknown label {args[0]} in {name}")
+                    op = GOTO if command == 'goto' else IF_GOTO
+                    instruction = (op, labels[(name, args[0])], 0)
+                    cost = OP_CYCLES[op]
+                elif command == 'call':
+                    target, n_args = args[0], int(args[1])
+                    if target in entries:
+                        instruction = (CALL, entries[target], n_args)
+                    elif target in self.os:
+                        instruction = (CALL_OS, (target, self.os[target]), n_args)
+                    else:
+                        raise Exception(f"Call to unknown function {target}")
+                    cost = OP_CYCLES[instruction[0]]
+                elif command == 'function':
+                    n_locals = int(args[1])
+                    instruction = (FUNCTION, n_locals, name)
+                    cost = 2 + 7 * n_locals
+                elif command == 'return':
+                    instruction = (RETURN, 0, 0)
+                    cost = OP_CYCLES[RETURN]
+                else:
+                    raise Exception(f"Unknown VM command: {command}")
+                code.append(instruction)
+                costs.append(cost)
+        return code, costs, entries
+
+    def address_of(self, segment, index, class_name, statics):
+        """Returns the fixed RAM address of a temp, pointer or static slot."""
+        if segment == 'temp':
+            return 5 + index
+        if segment == 'pointer':
+            return 3 + index
+        if segment == 'static':
+            # Statics are scoped by class, which is the .vm file they came from
+            key = (class_name, index)
+            if key not in statics:
+                address = STATIC_BASE + len(statics)
+                if address >= STATIC_END:
+                    raise Exception("Out of static variable space")
+                statics[key] = address
+            return statics[key]
+        raise Exception(f"Unknown segment: {segment}")
+
+    # ------------------------------
+    # Execution
+    # ------------------------------
+
+    def run(self, entry=None, max_steps=None):
+        """
+        Runs the program until the entry function returns or Sys.halt is called.
+        Every run starts from empty memory, so its statistics never include earlier runs.
+        :param entry: Function to start from (Sys.init if present, otherwise Main.main)
+        :param max_steps: Stop with an exception after this many instructions
+        :return: A dict with the execution statistics, see report()
+        """
+        self.reset()
+        code, costs, entries = self.decode()
+        if entry is None:
+            entry = 'Sys.init' if 'Sys.init' in entries else 'Main.main'
+        if entry not in entries:
+            raise Exception(f"Entry function {entry} is not defined")
+
+        ram = self.ram
+        hits = [0] * len(code)
+        calls = Counter()
+        limit = max_steps if max_steps is not None else -1
+
+        # Bootstrap: a frame whose return address (-1) ends the run
+        sp = STACK_BASE
+        ram[1] = ram[2] = sp
+        for value in (-1, 0, 0, 0, 0):
+            ram[sp] = value
+            sp += 1
+        ram[1] = sp
+        pc = entries[entry]
+
+        steps = 0
+        try:
+            while pc >= 0:
+                if steps == limit:
+                    raise Exception(f"Exceeded {max_steps} instructions")
+                steps += 1
+                hits[pc] += 1
+                op, a, b = code[pc]
+                pc += 1
+                if op == PUSH_SEG:
+                    ram[sp] = ram[ram[a] + b]
+                    sp += 1
+                elif op == PUSH_CONST:
+                    ram[sp] = a
+                    sp += 1
+                elif op == PUSH_ADDR:
+                    ram[sp] = ram[a]
+                    sp += 1
+                elif op == POP_SEG:
+                    sp -= 1
+                    ram[ram[a] + b] = ram[sp]
+                elif op == POP_ADDR:
+                    sp -= 1
+                    ram[a] = ram[sp]
+                elif op == ADD:
+                    sp -= 1
+                    ram[sp - 1] = wrap(ram[sp - 1] + ram[sp])
+                elif op == SUB:
+                    sp -= 1
+                    ram[sp - 1] = wrap(ram[sp - 1] - ram[sp])
+                elif op == NEG:
+                    ram[sp - 1] = wrap(-ram[sp - 1])
+                elif op == EQ:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] == ram[sp] else 0
+                elif op == GT:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] > ram[sp] else 0
+                elif op == LT:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] < ram[sp] else 0
+                elif op == AND:
+                    sp -= 1
+                    ram[sp - 1] = ram[sp - 1] & ram[sp]
+                elif op == OR:
+                    sp -= 1
+                    ram[sp - 1] = ram[sp - 1] | ram[sp]
+                elif op == NOT:
+                    ram[sp - 1] = ~ram[sp - 1]
+                elif op == GOTO:
+                    pc = a
+                elif op == IF_GOTO:
+                    sp -= 1
+                    if ram[sp] != 0:
+                        pc = a
+                elif op == CALL:
+                    ram[sp] = pc
+                    ram[sp + 1] = ram[1]
+                    ram[sp + 2] = ram[2]
+                    ram[sp + 3] = ram[3]
+                    ram[sp + 4] = ram[4]
+                    sp += 5
+                    ram[2] = sp - b - 5
+                    ram[1] = sp
+                    pc = a
+                elif op == CALL_OS:
+                    name, stub = a
+                    calls[name] += 1
+                    sp -= b
+                    ram[0] = sp
+                    ram[sp] = stub(*ram[sp:sp + b])
+                    sp += 1
+                elif op == FUNCTION:
+                    calls[b] += 1
+                    for i in range(a):
+                        ram[sp + i] = 0
+                    sp += a
+                elif op == RETURN:
+                    frame = ram[1]
+                    return_address = ram[frame - 5]
+                    arg = ram[2]
+                    ram[arg] = ram[sp - 1]
+                    sp = arg + 1
+                    ram[4] = ram[frame - 1]
+                    ram[3] = ram[frame - 2]
+                    ram[2] = ram[frame - 3]
+                    ram[1] = ram[frame - 4]
+                    pc = return_address
+        except VMHalt:
+            pass
+        ram[0] = sp
+
+        self.code = code
+        self.hits = hits
+        return self.report(code, costs, hits, calls)
+
+    def report(self, code, costs, hits, calls):
+        """
+        Summarizes a run.
+        :return: A dict with 'instructions' (VM commands executed), 'cycles' (estimated
+                 Hack instructions, OS stubs excluded), 'calls' (invocations per function),
+                 'function_instructions' (instructions executed inside each function),
+                 'allocations' and 'allocated_words' (heap usage) and 'output'
+        """
+        function_instructions = Counter()
+        current = None
+        for (op, a, b), count in zip(code, hits):
+            if op == FUNCTION:
+                current = b
+            function_instructions[current] += count
+        return {
+            'instructions': sum(hits),
+            'cycles': sum(cost * count for cost, count in zip(costs, hits)),
+            'calls': calls,
+            'function_instructions': function_instructions,
+            'allocations': self.allocations,
+            'allocated_words': self.allocated_words,
+            'output': ''.join(self.output),
+        }
+
+    # ------------------------------
+    # OS stubs
+    # ------------------------------
+
+    def os_divide(self, a, b):
+        if b == 0:
+            raise Exception("Division by zero")
+        quotient = abs(a) // abs(b)
+        return quotient if (a < 0) == (b < 0) else -quotient
+
+    def os_alloc(self, size):
+        if self.heap_pointer + size > HEAP_END:
+            raise Exception("Heap overflow")
+        address = self.heap_pointer
+        self.heap_pointer += size
+        self.allocations += 1
+        self.allocated_words += size
+        return address
+
+    def os_poke(self, address, value):
+        self.ram[address] = value
+        return 0
+
+    # Strings are laid out on the heap as [maximum length, length, characters...]
+    def os_string_new(self, max_length):
+        s = self.os_alloc(max_length + 2)
+        self.ram[s] = max_length
+        self.ram[s + 1] = 0
+        return s
+
+    def os_string_set_char_at(self, s, i, c):
+        self.ram[s + 2 + i] = c
+        return 0
+
+    def os_string_append_char(self, s, c):
+        length = self.ram[s + 1]
+        if length >= self.ram[s]:
+            raise Exception("String is full")
+        self.ram[s + 2 + length] = c
+        self.ram[s + 1] = length + 1
+        return s
+
+    def os_string_erase_last_char(self, s):
+        if self.ram[s + 1] > 0:
+            self.ram[s + 1] -= 1
+        return 0
+
+    def os_string_int_value(self, s):
+        text = self.string_value(s)
+        digits = text[1:] if text.startswith('-') else text
+        value = 0
+        for char in digits:
+            if not char.isdigit():
+                break
+            value = value * 10 + int(char)
+        return wrap(-value if text.startswith('-') else value)
+
+    def os_string_set_int(self, s, i):
+        text = str(i)
+        if len(text) > self.ram[s]:
+            raise Exception("String is full")
+        for index, char in enumerate(text):
+            self.ram[s + 2 + index] = ord(char)
+        self.ram[s + 1] = len(text)
+        return 0
+
+    def string_value(self, s):
+        return ''.join(chr(self.ram[s + 2 + i]) for i in range(self.ram[s + 1]))
+
+    def os_print_char(self, c):
+        self.os_print_text('\n' if c == 128 else chr(c))
+        return 0
+
+    def os_print_string(self, s):
+        self.os_print_text(self.string_value(s))
+        return 0
+
+    def os_print_text(self, text):
+        self.output.append(text)
+        return 0
+
+    def os_halt(self):
+        raise VMHalt()
+
+    def os_error(self, code):
+        raise Exception(f"Sys.error {code}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python VMInterpreter.py <file.vm | directory | bundle.vmb> ...")
+        sys.exit(1)
+    interpreter = VMInterpreter()
+    for path in sys.argv[1:]:
+        interpreter.load(path)
+    stats = interpreter.run()
+    if stats['output']:
+        print(stats['output'])
+    print(f"instructions: {stats['instructions']}")
+    print(f"cycles (estimated): {stats['cycles']}")
+    print(f"heap allocations: {stats['allocations']} ({stats['allocated_words']} words)")
+    print("calls:")
+    for name, count in stats['calls'].most_common():
+        print(f"  {name}: {count} calls, {stats['function_instructions'].get(name, 0)} instructions")
@@ -0,0 +1,199 @@
+import mmap
+import os
+import sys
+
+# Bundle layout:
+#   VMBUNDLE <version> <index size in bytes, 10 digits> <function count>\n
+#   <function name> <class name> <offset> <length>\n     (one line per function)
+#   <VM code of every function, Sys.init first>
+# Offsets are in bytes and relative to the end of the index.
+BUNDLE_MAGIC = "VMBUNDLE"
+BUNDLE_VERSION = 1
+
+
+class VMLinker:
+    def __init__(self):
+        """
+        Collects compiled functions, class by class, and writes them as one bundle.
+        """
+        self.classes = {}  # class name -> {function name: VM code}
+
+    def add_file(self, path):
+        """
+        Adds (or replaces) the class compiled into a .vm file.
+        :param path: Path to the .vm file; its name is the class name
+        """
+        class_name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'r') as f:
+            self.add_source(class_name, f.read())
+
+    def add_source(self, class_name, text):
+        """
+        Adds (or replaces) the functions of a class from its VM code.
+        :param class_name: The class the code was compiled from
+        :param text: The VM commands, one per line
+        """
+        functions = {}
+        current = None
+        for line in text.split('\n'):
+            stripped = line.split('//')[0].strip()
+            if not stripped:
+                continue
+            if stripped.startswith('function '):
+                current = sys.intern(stripped.split()[1])
+                if current in functions:
+                    raise Exception(f"Function {current} is defined twice in {class_name}")
+                functions[current] = []
+            elif current is None:
+                raise Exception(f"Command outside of a function in {class_name}: {stripped}")
+            functions[current].append(stripped)
+        self.classes[class_name] = {name: '\n'.join(lines) + '\n' for name, lines in functions.items()}
+
+    def add_bundle(self, path):
+        """
+        Adds every class of an existing bundle, so that only the classes that changed
+        need to be added again before relinking.
+        :param path: Path to the bundle
+        """
+        bundle = VMBundle(path)
+        try:
+            for name, (class_name, offset, length) in bundle.index.items():
+                self.classes.setdefault(class_name, {})[name] = bundle.function(name)
+        finally:
+            bundle.close()
+
+    def remove_class(self, class_name):
+        """Drops a class that no longer exists from the next link."""
+        self.classes.pop(class_name, None)
+
+    def write(self, path):
+        """
+        Links the collected classes into a bundle file.
+        Every function name must be defined once across all classes. Sys.init is
+        placed first so loaders can start executing at the beginning of the code.
+        :param path: Path of the bundle to write
+        """
+        owners = {}
+        for class_name, functions in self.classes.items():
+            for name in functions:
+                if name in owners:
+                    raise Exception(f"Function {name} is defined in both {owners[name]} and {class_name}")
+                owners[name] = class_name
+
+        order = sorted(owners, key=lambda name: (name != 'Sys.init', owners[name], name))
+        index_lines = []
+        chunks = []
+        offset = 0
+        for name in order:
+            code = self.classes[owners[name]][name].encode('ascii')
+            index_lines.append(f"{name} {owners[name]} {offset} {len(code)}\n")
+            chunks.append(code)
+            offset += len(code)
+
+        index = ''.join(index_lines).encode('ascii')
+        header = f"{BUNDLE_MAGIC} {BUNDLE_VERSION} {len(index):010d} {len(order)}\n".encode('ascii')
+
+        # Write next to the target and swap it in, so readers never see a partial bundle
+        temporary = path + '.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(header)
+                f.write(index)
+                f.writelines(chunks)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+
+class VMBundle:
+    def __init__(self, path):
+        """
+        Maps a bundle into memory and reads its function index.
+        :param path: Path to the bundle
+        """
+        self.file = open(path, 'rb')
+        self.data = b''
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size:
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            header_end = self.data.find(b'\n') + 1
+            header = self.data[:header_end].decode('ascii', 'replace').split()
+            if (len(header) != 4 or header[0] != BUNDLE_MAGIC or not header[1].isdigit()
+                    or int(header[1]) != BUNDLE_VERSION or not header[2].isdigit()):
+                raise Exception(f"{path} is not a VM bundle")
+            self.code_start = header_end + int(header[2])
+
+            if not header[3].isdigit() or self.code_start > len(self.data):
+                raise Exception(f"{path} is truncated")
+
+            self.index = {}  # function name -> (class name, offset, length)
+            code_size = len(self.data) - self.code_start
+            total = 0
+            for line in self.data[header_end:self.code_start].decode('ascii').splitlines():
+                name, class_name, offset, length = line.split()
+                offset, length = int(offset), int(length)
+                if offset < 0 or length < 0 or offset + length > code_size:
+                    raise Exception(f"Function {name} lies outside of the code")
+                self.index[sys.intern(name)] = (sys.intern(class_name), offset, length)
+                total += length
+            if len(self.index) != int(header[3]):
+                raise Exception(f"Expected {header[3]} functions, found {len(self.index)}")
+            if total != code_size:
+                raise Exception(f"Code is {code_size} bytes, functions add up to {total}")
+        except Exception as e:
+            self.close()
+            raise Exception(f"Failed to read bundle {path}: {str(e)}")
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def function(self, name):
+        """
+        :param name: The full function name, e.g. Main.main
+        :return: The VM code of the function, starting with its 'function' command
+        """
+        class_name, offset, length = self.index[name]
+        start = self.code_start + offset
+        return self.data[start:start + length].decode('ascii')
+
+    def source(self):
+        """
+        :return: The VM code of the whole program
+        """
+        return self.data[self.code_start:].decode('ascii')
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    removed = []
+    while '--remove' in arguments:
+        position = arguments.index('--remove')
+        if position + 1 == len(arguments):
+            print("--remove needs a class name")
+            sys.exit(1)
+        removed.append(arguments.pop(position + 1))
+        arguments.pop(position)
+    if not arguments or (len(arguments) < 2 and not removed):
+        print("Usage: python VMLinker.py <bundle> [--remove <Class>]... <file.vm | directory> ...")
+        print("An existing bundle is relinked: the given classes are replaced and the removed ones dropped.")
+        sys.exit(1)
+    bundle_path = arguments[0]
+    linker = VMLinker()
+    if os.path.exists(bundle_path):
+        linker.add_bundle(bundle_path)
+    for class_name in removed:
+        linker.remove_class(class_name)
+    for path in arguments[1:]:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.vm'):
+                    linker.add_file(os.path.join(path, name))
+        else:
+            linker.add_file(path)
+    linker.write(bundle_path)
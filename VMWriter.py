@@ -1,51 +1,447 @@
 from symbolTable import SymbolTable
+
+ARRAY_READ_TAIL = ["add", "pop pointer 1", "push that 0"]
+# Array reads themselves move pointer 1, so operands read through it are never cached
+CACHEABLE_SEGMENTS = ("constant", "local", "argument", "static", "this", "temp")
+
 class VMWriter:
-    def __init__(self, output_file):
+    def __init__(self, output_file, symbol_table=None, optimize=False):
         """
                 Initializes a new output .vm file/stream and prepares it for writing.
+                Each function is buffered until the next one starts (or the writer is
+                closed), so its code can be optimized before it is written out.
                 :param out_file: The name of the output file or stream
+                :param symbol_table: The class symbol table. With optimize, repeated array
+                                     reads are cached in hidden locals defined in it.
+                                     Reset it for the next subroutine only after
+                                     writing the 'return' of the current one
+                :param optimize: Optimize each function before writing it: cache repeated
+                                 array reads (needs symbol_table) and lay out branches.
+                                 Breaking change: a symbol_table alone used to turn on
+                                 the array-read caching, which now also needs optimize
                 """
         self.output_file = open(output_file, "w")
+        self.symbol_table = symbol_table
+        self.optimize = optimize
+        self.string_pool = {}  # string literal -> its index in the pooled strings array
+        self.string_static = None  # static index of the pooled strings array
+        self.string_class = None  # class whose functions use the pooled literals
+        self.label_count = 0
+        self.function = None  # (name, nLocals) of the function being buffered
+        self.body = []  # optimized commands of the function
+        self.block = []  # commands of the current straight-line block
+        self.hidden_locals = 0
 
     def writer(self, command):
-        self.output_file.write(command + "\n")
+        self.emit(command)
 
     def close(self):
+        self.flush_function()
+        if self.string_pool:
+            self.write_string_pool()
         self.output_file.close()
 
+    def emit(self, command, barrier=False):
+        """
+        Adds a command to the current block. Control flow commands are barriers:
+        they close the block before and after themselves.
+        """
+        if barrier:
+            self.end_block()
+        self.block.append(command)
+        if barrier:
+            self.end_block()
+
+    def end_block(self):
+        self.body.extend(self.eliminate_common_subexpressions(self.block))
+        self.block = []
+
+    def flush_function(self):
+        """
+        Writes the buffered function, counting the hidden locals it needed.
+        This runs when the next function starts, usually after the symbol table was
+        reset for it, so hidden locals can no longer be defined here. Blocks are
+        optimized when they end instead: a Jack subroutine ends with 'return', which
+        closes its last block while the table still describes that subroutine. Code
+        left after the last 'return' (never executed) is written as it is.
+        """
+        self.body.extend(self.block)
+        self.block = []
+        if self.function is not None:
+            name, nLocals = self.function
+            self.output_file.write(f"function {name} {nLocals + self.hidden_locals}\n")
+        for command in self.optimize_branches(self.body):
+            self.output_file.write(command + "\n")
+        self.function = None
+        self.body = []
+        self.hidden_locals = 0
+
     def writePush(self, segment, index):
-        self.output_file.write(f"push {segment} {index}\n")
+        self.emit(f"push {segment} {index}")
 
     def writePop(self, segment, index):
-        self.output_file.write(f"pop {segment} {index}\n")
+        self.emit(f"pop {segment} {index}")
 
     def writeArithmetic(self, command):
-        self.output_file.write(f"{command}\n")
+        self.emit(command)
 
     def writeLabel(self, label):
-        LABEL = label.upper()
-        self.output_file.write(f"({LABEL})\n")
+        self.emit(f"label {label}", barrier=True)
 
     def writeGoto(self, label):
-        self.output_file.write(f"goto {label}\n")
+        self.emit(f"goto {label}", barrier=True)
 
     def writeIf(self, label):
-        self.output_file.write(f"if-goto {label}\n")
+        self.emit(f"if-goto {label}", barrier=True)
 
     def writeCall(self, name, nArgs):
-        self.output_file.write(f"call {name} {nArgs}\n")
+        self.emit(f"call {name} {nArgs}")
 
     def writeFunction(self, name, nLocals):
-        self.output_file.write(f"function {name} {nLocals}\n")
+        self.flush_function()
+        self.function = (name, nLocals)
 
     def writeReturn(self):
-        self.output_file.write("return\n")
+        self.emit("return", barrier=True)
+
+    def eliminate_common_subexpressions(self, block):
+        """
+        Computes each repeated array read (push base / push index / add /
+        pop pointer 1 / push that 0) once per block and reuses the value from a
+        hidden local. Expressions have no side effects other than calls, so a
+        cached value stays valid until a call or a pop that is not part of an
+        array read, which may change a variable or an array element.
+        :param block: commands of a straight-line block
+        :return: the rewritten commands
+        """
+        if not self.optimize or self.symbol_table is None:
+            return block
+
+        # Find the groups of identical reads that live between two invalidations
+        groups = []
+        live = {}
+        i = 0
+        while i < len(block):
+            command = block[i]
+            if (block[i + 2:i + 5] == ARRAY_READ_TAIL
+                    and self.is_cacheable_push(block[i]) and self.is_cacheable_push(block[i + 1])):
+                live.setdefault((block[i], block[i + 1]), []).append(i)
+                i += 5
+                continue
+            if command.startswith("pop ") or command.startswith("call "):
+                groups.append(live)
+                live = {}
+            i += 1
+        groups.append(live)
+
+        first_uses = {}  # start of first read -> hidden local index
+        reuses = {}  # start of a repeated read -> hidden local index
+        for live in groups:
+            repeated = [starts for starts in live.values() if len(starts) > 1]
+            for slot, starts in enumerate(repeated):
+                index = self.hidden_local(slot)
+                first_uses[starts[0]] = index
+                for start in starts[1:]:
+                    reuses[start] = index
+
+        if not first_uses:
+            return block
+        result = []
+        i = 0
+        while i < len(block):
+            if i in first_uses:
+                result.extend(block[i:i + 5])
+                result.append(f"pop local {first_uses[i]}")
+                result.append(f"push local {first_uses[i]}")
+                i += 5
+            elif i in reuses:
+                result.append(f"push local {reuses[i]}")
+                i += 5
+            else:
+                result.append(block[i])
+                i += 1
+        return result
+
+    def optimize_branches(self, body):
+        """
+        Lays out the branches of a function so that fewer jumps run:
+        - 'not not' pairs are dropped
+        - loops test their condition at the bottom, with a single conditional jump
+          back to the body instead of 'not / if-goto end' at the top and a 'goto' back
+        - if/else branches directly on the condition, swapping the two blocks
+          instead of negating it
+        - a 'goto' to a label that immediately follows it is dropped
+        'if-goto' jumps on any nonzero value while 'not' only turns -1 into 0, so a
+        'not' is only added or removed when the condition is known to be 0 or -1.
+        The pass makes one recursive sweep over the function and runs in linear time.
+        :param body: commands of a function
+        :return: the rewritten commands
+        """
+        if not self.optimize:
+            return body
+
+        result = []
+        for command in body:
+            if command == "not" and result and result[-1] == "not":
+                result.pop()
+            else:
+                result.append(command)
+        body = result
+
+        # Everything the rewrites look up is computed once, on the unmodified body
+        info = {"labels": {}, "references": {}, "next_control": [len(body)] * len(body),
+                "tops": self.stack_tops(body)}
+        for i, command in enumerate(body):
+            if command.startswith("label "):
+                label = command[6:]
+                # A label defined twice is never rewritten
+                info["labels"][label] = None if label in info["labels"] else i
+            elif command.startswith("goto ") or command.startswith("if-goto "):
+                label = command.split(" ", 1)[1]
+                info["references"][label] = info["references"].get(label, 0) + 1
+        following = len(body)
+        for i in range(len(body) - 1, -1, -1):
+            info["next_control"][i] = following
+            if self.is_control_flow(body[i]):
+                following = i
 
+        result = []
+        self.layout(body, 0, len(body), info, result)
+        body = result
 
+        result = []
+        for i, command in enumerate(body):
+            if command.startswith("goto "):
+                label = f"label {command[5:]}"
+                j = i + 1
+                while j < len(body) and body[j].startswith("label ") and body[j] != label:
+                    j += 1
+                if j < len(body) and body[j] == label:
+                    continue
+            result.append(command)
+        return result
 
+    def layout(self, body, start, end, info, out):
+        """Appends body[start:end] to out, rewriting the loops and ifs found in it."""
+        i = start
+        while i < end:
+            following = self.rotate_loop(body, i, end, info, out)
+            if following is None:
+                following = self.invert_if(body, i, end, info, out)
+            if following is None:
+                out.append(body[i])
+                following = i + 1
+            i = following
 
+    def rotate_loop(self, body, i, end, info, out):
+        """
+        Rewrites 'label top / cond / if-goto exit / body / goto top / label exit'
+        starting at i as 'goto top / label loop / body / label top / cond' followed
+        by a branch back to the loop while the condition holds.
+        :return: the index after the loop, or None if no loop starts at i
+        """
+        if not body[i].startswith("label "):
+            return None
+        top = body[i][6:]
+        j = info["next_control"][i]
+        if j >= end or not body[j].startswith("if-goto "):
+            return None
+        exit_label = body[j][8:]
+        k = info["labels"].get(exit_label)
+        if k is None or k >= end or k - 1 <= j or body[k - 1] != f"goto {top}":
+            return None
+        if (info["labels"].get(top) != i or info["references"].get(top) != 1
+                or info["references"].get(exit_label) != 1):
+            return None
+
+        # The loop runs while the exit condition is false
+        condition = body[i + 1:j]
+        if condition and condition[-1] == "not" and self.is_boolean(info["tops"][j - 1]):
+            condition = condition[:-1]
+        elif self.is_boolean(info["tops"][j]):
+            condition = condition + ["not"]
+        else:
+            return None
+        loop = self.new_label("while_body")
+        out.append(f"goto {top}")
+        out.append(f"label {loop}")
+        self.layout(body, j + 1, k - 1, info, out)
+        out.append(f"label {top}")
+        out.extend(condition)
+        out.append(f"if-goto {loop}")
+        out.append(f"label {exit_label}")
+        return k + 1
+
+    def invert_if(self, body, i, end, info, out):
+        """
+        Rewrites 'not / if-goto else / then / goto end / label else / else / label end'
+        starting at i as 'if-goto then / else / goto end / label then / then / label end'.
+        :return: the index after the if, or None if no negated if/else starts at i
+        """
+        if body[i] != "not" or i + 1 >= end or not body[i + 1].startswith("if-goto "):
+            return None
+        if not self.is_boolean(info["tops"][i]):
+            return None
+        otherwise = body[i + 1][8:]
+        a = info["labels"].get(otherwise)
+        if a is None or a - 1 <= i + 1 or a >= end or not body[a - 1].startswith("goto "):
+            return None
+        end_label = body[a - 1][5:]
+        b = info["labels"].get(end_label)
+        if b is None or b <= a or b >= end:
+            return None
+        if info["references"].get(otherwise) != 1 or info["references"].get(end_label) != 1:
+            return None
+
+        then = self.new_label("if_true")
+        out.append(f"if-goto {then}")
+        self.layout(body, a + 1, b, info, out)
+        out.append(f"goto {end_label}")
+        out.append(f"label {then}")
+        self.layout(body, i + 2, a - 1, info, out)
+        out.append(f"label {end_label}")
+        return b + 1
+
+    def stack_tops(self, body):
+        """
+        Tracks what is known about the value on top of the stack before each command:
+        'bool' for a comparison result (0 or -1), ('const', value) for a constant, or
+        None. Values pushed before the start of a block are unknown.
+        """
+        tops = []
+        stack = []
+        for command in body:
+            tops.append(stack[-1] if stack else None)
+            parts = command.split()
+            op = parts[0]
+            if op in ("label", "goto", "if-goto", "return", "function"):
+                stack = []
+            elif op == "push":
+                stack.append(("const", int(parts[2])) if parts[1] == "constant" else None)
+            elif op == "pop":
+                self.pop_value(stack)
+            elif op in ("eq", "gt", "lt"):
+                self.pop_value(stack)
+                self.pop_value(stack)
+                stack.append("bool")
+            elif op in ("and", "or"):
+                right = self.pop_value(stack)
+                left = self.pop_value(stack)
+                if isinstance(left, tuple) and isinstance(right, tuple):
+                    value = left[1] & right[1] if op == "and" else left[1] | right[1]
+                    stack.append(("const", value))
+                elif self.is_boolean(left) and self.is_boolean(right):
+                    stack.append("bool")
+                else:
+                    stack.append(None)
+            elif op in ("not", "neg"):
+                value = self.pop_value(stack)
+                if isinstance(value, tuple):
+                    stack.append(("const", ~value[1] if op == "not" else -value[1]))
+                elif value == "bool" and op == "not":
+                    stack.append("bool")
+                else:
+                    stack.append(None)
+            elif op in ("add", "sub"):
+                self.pop_value(stack)
+                self.pop_value(stack)
+                stack.append(None)
+            elif op == "call":
+                for _ in range(int(parts[2])):
+                    self.pop_value(stack)
+                stack.append(None)
+        return tops
 
+    def pop_value(self, stack):
+        return stack.pop() if stack else None
 
+    def is_boolean(self, value):
+        return value == "bool" or value in (("const", 0), ("const", -1))
 
+    def is_control_flow(self, command):
+        return command.split(" ", 1)[0] in ("label", "goto", "if-goto", "return", "function")
+
+    def new_label(self, prefix):
+        """
+        Returns a fresh label. ':' is a legal VM symbol character that the compiler
+        never puts in a label, so the label cannot collide with one of its labels.
+        """
+        label = f"opt:{prefix}{self.label_count}"
+        self.label_count += 1
+        return label
+
+    def is_cacheable_push(self, command):
+        parts = command.split()
+        return parts[0] == "push" and parts[1] in CACHEABLE_SEGMENTS
+
+    def hidden_local(self, slot):
+        """
+        Returns the local index of the given hidden variable of the current function,
+        defining it in the symbol table the first time it is needed.
+        """
+        name = f"$cse{slot}"
+        if slot >= self.hidden_locals:
+            # '$' cannot appear in a Jack identifier, so the name never collides
+            self.symbol_table.define(name, "int", "var")
+            self.hidden_locals += 1
+        return self.symbol_table.indexOf(name)
+
+    def writeStringConstant(self, string):
+        """
+        Pushes a string constant, building each distinct literal only once per class.
+        The pooled literals are kept in one Array held by a single synthetic static of
+        the class, so pooling uses one static slot however many literals there are.
+        The first use of any literal calls the class helper written by close(), which
+        builds all of them, so each use site is a null check plus an array read.
+        Pooled literals are shared, so mutating one is visible at every use site.
+        Needs the symbol table given to the constructor, to allocate the static.
+        :param string: the literal without its surrounding quotes
+        """
+        if self.function is None:
+            raise Exception("String constants must be written inside a function")
+        if self.symbol_table is None:
+            raise Exception("String pooling needs the class symbol table")
+        self.string_class = self.function[0].split(".")[0]
+        if self.string_static is None:
+            # '$' cannot appear in a Jack identifier, so the name never collides
+            self.symbol_table.define("$strings", "Array", "static")
+            self.string_static = self.symbol_table.indexOf("$strings")
+        if string not in self.string_pool:
+            self.string_pool[string] = len(self.string_pool)
 
+        ready = self.new_label("string_ready")
+        self.writePush("static", self.string_static)
+        self.writeIf(ready)
+        self.writeCall(f"{self.string_class}.strings:init", 0)
+        self.writePop("temp", 0)
+        self.writeLabel(ready)
+        # strings[k]
+        self.writePush("static", self.string_static)
+        self.writePush("constant", self.string_pool[string])
+        self.writeArithmetic("add")
+        self.writePop("pointer", 1)
+        self.writePush("that", 0)
 
+    def write_string_pool(self):
+        """Writes the class helper that builds every pooled literal into the strings array."""
+        self.writeFunction(f"{self.string_class}.strings:init", 0)
+        self.writePush("constant", len(self.string_pool))
+        self.writeCall("Array.new", 1)
+        self.writePop("static", self.string_static)
+        for string, index in self.string_pool.items():
+            # let strings[index] = <the literal>
+            self.writePush("static", self.string_static)
+            self.writePush("constant", index)
+            self.writeArithmetic("add")
+            self.writePush("constant", len(string))
+            self.writeCall("String.new", 1)
+            for char in string:
+                self.writePush("constant", ord(char))
+                self.writeCall("String.appendChar", 2)
+            self.writePop("temp", 0)
+            self.writePop("pointer", 1)
+            self.writePush("temp", 0)
+            self.writePop("that", 0)
+        self.writePush("constant", 0)
+        self.writeReturn()
+        self.flush_function()
@@ -0,0 +1,39 @@
+class XMLWriter:
+    """
+    Consumes the parse events of a CompilationEngine and writes them out as XML.
+    """
+    ESCAPES = {'<': '&lt;', '>': '&gt;', '&': '&amp;'}
+
+    def __init__(self, output_file, compact=False):
+        """
+        Opens the output .xml file for writing.
+        :param output_file: The name of the output file
+        :param compact: If True, every element is written on its own line with no indentation
+        """
+        self.output_file = open(output_file, "w")
+        self.compact = compact
+        self.indent_level = 0
+
+    def close(self):
+        self.output_file.close()
+
+    def indent(self):
+        if self.compact:
+            return ''
+        return '  ' * self.indent_level
+
+    def start(self, tag):
+        """Writes the opening tag of a nested structure."""
+        self.output_file.write(f'{self.indent()}<{tag}>\n')
+        self.indent_level += 1
+
+    def end(self, tag):
+        """Writes the closing tag of a nested structure."""
+        self.indent_level -= 1
+        self.output_file.write(f'{self.indent()}</{tag}>\n')
+
+    def token(self, kind, value):
+        """Writes a terminal element, escaping special XML characters."""
+        value = str(value)
+        value = self.ESCAPES.get(value, value)
+        self.output_file.write(f'{self.indent()}<{kind}> {value} </{kind}>\n')
@@ -0,0 +1,140 @@
+"""
+Compares executed VM instructions of a loop-heavy program with and without the
+branch layout optimization.
+
+The program is the VM code a Jack compiler emits for:
+    let i = 0;
+    while (i < OUTER) {
+        let j = 0;
+        while (j < INNER) {
+            if ((j & 1) = 0) { let s = s + j; } else { let s = s - 1; }
+            if (~(j > 10)) { let s = s + 1; }
+            if (j) { let s = s + 2; }
+            let j = j + 1;
+        }
+        let i = i + 1;
+    }
+    do Output.printInt(s);
+
+Run from the repository root: python benchmarks/bench_branches.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from VMInterpreter import VMInterpreter
+from VMWriter import VMWriter
+
+OUTER = 100
+INNER = 50
+I, J, S = ("local", 0), ("local", 1), ("local", 2)
+
+
+class Program:
+    """Emits the canonical lowering of Jack statements, numbering labels as it goes."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.if_count = 0
+        self.while_count = 0
+
+    def add_to(self, variable, operand, command="add"):
+        self.writer.writePush(*variable)
+        self.writer.writePush(*operand)
+        self.writer.writeArithmetic(command)
+        self.writer.writePop(*variable)
+
+    def while_statement(self, condition, body):
+        n = self.while_count
+        self.while_count += 1
+        self.writer.writeLabel(f"WHILE_EXP{n}")
+        condition()
+        self.writer.writeArithmetic("not")
+        self.writer.writeIf(f"WHILE_END{n}")
+        body()
+        self.writer.writeGoto(f"WHILE_EXP{n}")
+        self.writer.writeLabel(f"WHILE_END{n}")
+
+    def if_statement(self, condition, then, otherwise=None):
+        n = self.if_count
+        self.if_count += 1
+        condition()
+        self.writer.writeArithmetic("not")
+        self.writer.writeIf(f"IF_FALSE{n}")
+        then()
+        self.writer.writeGoto(f"IF_END{n}")
+        self.writer.writeLabel(f"IF_FALSE{n}")
+        if otherwise is not None:
+            otherwise()
+        self.writer.writeLabel(f"IF_END{n}")
+
+    def compare(self, variable, constant, command):
+        def condition():
+            self.writer.writePush(*variable)
+            self.writer.writePush("constant", constant)
+            self.writer.writeArithmetic(command)
+        return condition
+
+
+def build(path, optimize):
+    writer = VMWriter(path, optimize=optimize)
+    program = Program(writer)
+    writer.writeFunction("Main.main", 3)
+
+    def even_condition():
+        writer.writePush(*J)
+        writer.writePush("constant", 1)
+        writer.writeArithmetic("and")
+        writer.writePush("constant", 0)
+        writer.writeArithmetic("eq")
+
+    def small_condition():
+        program.compare(J, 10, "gt")()
+        writer.writeArithmetic("not")
+
+    def nonzero_condition():
+        writer.writePush(*J)
+
+    def inner_body():
+        program.if_statement(even_condition, lambda: program.add_to(S, J),
+                             lambda: program.add_to(S, ("constant", 1), "sub"))
+        program.if_statement(small_condition, lambda: program.add_to(S, ("constant", 1)))
+        program.if_statement(nonzero_condition, lambda: program.add_to(S, ("constant", 2)))
+        program.add_to(J, ("constant", 1))
+
+    def outer_body():
+        writer.writePush("constant", 0)
+        writer.writePop(*J)
+        program.while_statement(program.compare(J, INNER, "lt"), inner_body)
+        program.add_to(I, ("constant", 1))
+
+    writer.writePush("constant", 0)
+    writer.writePop(*I)
+    program.while_statement(program.compare(I, OUTER, "lt"), outer_body)
+    writer.writePush(*S)
+    writer.writeCall("Output.printInt", 1)
+    writer.writePop("temp", 0)
+    writer.writePush("constant", 0)
+    writer.writeReturn()
+    writer.close()
+
+
+def run(optimize):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Main.vm")
+        build(path, optimize)
+        interpreter = VMInterpreter()
+        interpreter.load(path)
+        return interpreter.run()
+
+
+if __name__ == '__main__':
+    plain = run(optimize=False)
+    optimized = run(optimize=True)
+    if plain['output'] != optimized['output']:
+        raise Exception("Optimized and plain programs print different output")
+    print(f"{'':10s} {'instructions':>12s} {'cycles':>10s}")
+    for label, stats in (("plain", plain), ("optimized", optimized)):
+        print(f"{label:10s} {stats['instructions']:12d} {stats['cycles']:10d}")
@@ -0,0 +1,121 @@
+"""
+Compares executed VM instructions of an array-heavy loop with and without caching
+repeated array reads in hidden locals.
+
+The loop computes, for i from 0 to SIZE - 1:
+    let s = s + a[i] + (a[i] * b[i]);
+    let s = s + a[i] + a[i];
+
+Run from the repository root: python benchmarks/bench_cse.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbolTable import SymbolTable
+from VMInterpreter import VMInterpreter
+from VMWriter import VMWriter
+
+SIZE = 100
+A, B, I, S = ("local", 0), ("local", 1), ("local", 2), ("local", 3)
+
+
+def write_array_read(writer, array, index):
+    writer.writePush(*array)
+    writer.writePush(*index)
+    writer.writeArithmetic("add")
+    writer.writePop("pointer", 1)
+    writer.writePush("that", 0)
+
+
+def write_array_store(writer, array, index, value):
+    writer.writePush(*array)
+    writer.writePush(*index)
+    writer.writeArithmetic("add")
+    writer.writePush(*value)
+    writer.writePop("temp", 0)
+    writer.writePop("pointer", 1)
+    writer.writePush("temp", 0)
+    writer.writePop("that", 0)
+
+
+def write_loop(writer, name, body):
+    """let i = 0; while (i < SIZE) { body; let i = i + 1; }"""
+    writer.writePush("constant", 0)
+    writer.writePop(*I)
+    writer.writeLabel(f"{name}_EXP")
+    writer.writePush(*I)
+    writer.writePush("constant", SIZE)
+    writer.writeArithmetic("lt")
+    writer.writeArithmetic("not")
+    writer.writeIf(f"{name}_END")
+    body()
+    writer.writePush(*I)
+    writer.writePush("constant", 1)
+    writer.writeArithmetic("add")
+    writer.writePop(*I)
+    writer.writeGoto(f"{name}_EXP")
+    writer.writeLabel(f"{name}_END")
+
+
+def build(path, cached):
+    symbol_table = SymbolTable()
+    for name in ("a", "b", "i", "s"):
+        symbol_table.define(name, "int", "var")
+    # Both runs lay out branches; only the cached one gets the symbol table CSE needs
+    writer = VMWriter(path, symbol_table if cached else None, optimize=True)
+    writer.writeFunction("Main.main", 4)
+    for array in (A, B):
+        writer.writePush("constant", SIZE)
+        writer.writeCall("Array.new", 1)
+        writer.writePop(*array)
+
+    def fill():
+        write_array_store(writer, A, I, I)
+        write_array_store(writer, B, I, ("constant", 2))
+
+    def accumulate():
+        writer.writePush(*S)
+        write_array_read(writer, A, I)
+        writer.writeArithmetic("add")
+        write_array_read(writer, A, I)
+        write_array_read(writer, B, I)
+        writer.writeCall("Math.multiply", 2)
+        writer.writeArithmetic("add")
+        writer.writePop(*S)
+        writer.writePush(*S)
+        write_array_read(writer, A, I)
+        writer.writeArithmetic("add")
+        write_array_read(writer, A, I)
+        writer.writeArithmetic("add")
+        writer.writePop(*S)
+
+    write_loop(writer, "FILL", fill)
+    write_loop(writer, "SUM", accumulate)
+    writer.writePush(*S)
+    writer.writeCall("Output.printInt", 1)
+    writer.writePop("temp", 0)
+    writer.writePush("constant", 0)
+    writer.writeReturn()
+    writer.close()
+
+
+def run(cached):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Main.vm")
+        build(path, cached)
+        interpreter = VMInterpreter()
+        interpreter.load(path)
+        return interpreter.run()
+
+
+if __name__ == '__main__':
+    plain = run(cached=False)
+    cached = run(cached=True)
+    if plain['output'] != cached['output']:
+        raise Exception("Cached and uncached programs print different output")
+    print(f"{'':10s} {'instructions':>12s} {'cycles':>10s}")
+    for label, stats in (("uncached", plain), ("cached", cached)):
+        print(f"{label:10s} {stats['instructions']:12d} {stats['cycles']:10d}")
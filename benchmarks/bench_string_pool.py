@@ -0,0 +1,78 @@
+"""
+Compares executed VM instructions and heap allocations of a loop that prints the
+same string literals on every iteration, with and without literal pooling.
+
+Run from the repository root: python benchmarks/bench_string_pool.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbolTable import SymbolTable
+from VMInterpreter import VMInterpreter
+from VMWriter import VMWriter
+
+ITERATIONS = 100
+LITERALS = ["Hello, world", "count: "]
+
+
+def write_literal(writer, string, pooled):
+    if pooled:
+        writer.writeStringConstant(string)
+        return
+    writer.writePush("constant", len(string))
+    writer.writeCall("String.new", 1)
+    for char in string:
+        writer.writePush("constant", ord(char))
+        writer.writeCall("String.appendChar", 2)
+
+
+def build(path, pooled):
+    """
+    function Main.main: var int i;
+        while (i < ITERATIONS) { do Output.printString(<each literal>); let i = i + 1; }
+    """
+    symbol_table = SymbolTable()
+    symbol_table.define("i", "int", "var")
+    writer = VMWriter(path, symbol_table)
+    writer.writeFunction("Main.main", 1)
+    writer.writeLabel("WHILE_EXP0")
+    writer.writePush("local", 0)
+    writer.writePush("constant", ITERATIONS)
+    writer.writeArithmetic("lt")
+    writer.writeArithmetic("not")
+    writer.writeIf("WHILE_END0")
+    for string in LITERALS:
+        write_literal(writer, string, pooled)
+        writer.writeCall("Output.printString", 1)
+        writer.writePop("temp", 0)
+    writer.writePush("local", 0)
+    writer.writePush("constant", 1)
+    writer.writeArithmetic("add")
+    writer.writePop("local", 0)
+    writer.writeGoto("WHILE_EXP0")
+    writer.writeLabel("WHILE_END0")
+    writer.writePush("constant", 0)
+    writer.writeReturn()
+    writer.close()
+
+
+def run(pooled):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "Main.vm")
+        build(path, pooled)
+        interpreter = VMInterpreter()
+        interpreter.load(path)
+        return interpreter.run()
+
+
+if __name__ == '__main__':
+    plain = run(pooled=False)
+    pooled = run(pooled=True)
+    if plain['output'] != pooled['output']:
+        raise Exception("Pooled and unpooled programs print different output")
+    print(f"{'':10s} {'instructions':>12s} {'cycles':>10s} {'allocations':>11s}")
+    for label, stats in (("unpooled", plain), ("pooled", pooled)):
+        print(f"{label:10s} {stats['instructions']:12d} {stats['cycles']:10d} {stats['allocations']:11d}")
@@ -33,7 +33,7 @@ class SymbolTable:
         :param kind
         :return - number of variables of a given kind already in the table
         """
-        return self.indexes[type]
+        return self.indexes[kind]
 
     def kindOf(self, name):
         """
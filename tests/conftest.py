@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "scaling: slow growth-rate tests, run only with RUN_SCALING=1")
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("RUN_SCALING") == "1":
+        return
+    skip = pytest.mark.skip(reason="scaling tests are slow; set RUN_SCALING=1 to run them")
+    for item in items:
+        if "scaling" in item.keywords:
+            item.add_marker(skip)
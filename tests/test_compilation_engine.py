@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from CompilationEngine import CompilationEngine
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SOURCE = os.path.join(FIXTURES, 'Main.jack')
+# Written by the engine as it was before parse events were introduced
+EXPECTED = os.path.join(FIXTURES, 'Main.xml')
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def start(self, tag):
+        self.events.append(('start', tag))
+
+    def end(self, tag):
+        self.events.append(('end', tag))
+
+    def token(self, kind, value):
+        self.events.append((kind, value))
+
+
+def compile_to_xml(tmp_path, compact=False):
+    path = tmp_path / 'Main.xml'
+    engine = CompilationEngine(SOURCE, str(path), compact=compact)
+    engine.compile_class()
+    engine.close()
+    return path.read_text()
+
+
+def test_default_xml_matches_previous_output(tmp_path):
+    with open(EXPECTED) as f:
+        assert compile_to_xml(tmp_path) == f.read()
+
+
+def test_compact_xml_has_no_indentation(tmp_path):
+    with open(EXPECTED) as f:
+        expected = ''.join(line.lstrip(' ') for line in f)
+    output = compile_to_xml(tmp_path, compact=True)
+    assert output == expected
+    assert not any(line.startswith(' ') for line in output.splitlines())
+
+
+def test_compact_with_handler_is_rejected():
+    with pytest.raises(Exception, match="compact"):
+        CompilationEngine(SOURCE, handler=Recorder(), compact=True)
+
+
+def test_handler_receives_balanced_events():
+    recorder = Recorder()
+    CompilationEngine(SOURCE, handler=recorder).compile_class()
+    events = recorder.events
+    assert events[0] == ('start', 'class') and events[-1] == ('end', 'class')
+
+    open_tags = []
+    for kind, value in events:
+        if kind == 'start':
+            open_tags.append(value)
+        elif kind == 'end':
+            assert open_tags.pop() == value
+        else:
+            assert open_tags, f"token {value} outside of any structure"
+    assert open_tags == []
+    assert ('stringConstant', 'a < b & c > d') in events
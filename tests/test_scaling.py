@@ -0,0 +1,178 @@
+"""
+Scaling tests: every stage is fed inputs of geometrically growing size and the
+growth exponent of its run time and peak memory is fitted on a log-log scale.
+A stage fails when that exponent shows superlinear growth.
+They take over a minute, so they only run with RUN_SCALING=1 in the environment.
+"""
+import math
+import time
+import tracemalloc
+
+import pytest
+
+from CompilationEngine import CompilationEngine
+from JackTokenizer import JackTokenizer
+from symbolTable import SymbolTable
+from VMWriter import VMWriter
+
+pytestmark = pytest.mark.scaling
+
+# Linear growth fits to 1.0; timing noise stays well below this bound
+MAX_EXPONENT = 1.3
+STEPS = (1, 2, 4, 8)
+REPEATS = 3
+# Fast stages are repeated until this much time has passed, so jitter cannot dominate
+MIN_TOTAL_TIME = 0.2
+
+
+class NullHandler:
+    """Discards parse events, so only the parser itself is measured."""
+
+    def start(self, tag):
+        pass
+
+    def end(self, tag):
+        pass
+
+    def token(self, kind, value):
+        pass
+
+
+def huge_string(step):
+    # 128 KB up to 1 MB
+    return 'class A { function void f() { do Output.printString("' + 'x' * (step << 17) + '"); return; } }'
+
+
+def many_lines(step):
+    # 12.5k up to 100k lines
+    body = ''.join(f'let x = x + {i}; // line {i}\n' for i in range(step * 12500))
+    return 'class A {\nfunction void f() {\nvar int x;\n' + body + 'return;\n}\n}\n'
+
+
+def single_line(step):
+    body = ''.join(f'let x = x + {i}; ' for i in range(step * 12500))
+    return 'class A { function void f() { var int x; ' + body + 'return; } }'
+
+
+def deep_nesting(step):
+    # 50 up to 400 levels of nested parentheses and while loops, repeated to a measurable size
+    depth = step * 50
+    expression = '(' * depth + 'x' + ')' * depth
+    loops = 'while (x) {' * depth + 'let x = x;' + '}' * depth
+    body = f'let x = {expression}; {loops}\n' * 20
+    return 'class A { function void f() { var int x; ' + body + 'return; } }'
+
+
+def many_subroutines(step):
+    # 1000 up to 8000 subroutines
+    subroutines = ''.join(f'function int f{i}(int a, int b) {{ var int x; let x = a + b; return x; }}\n'
+                          for i in range(step * 1000))
+    return 'class A {\n' + subroutines + '}\n'
+
+
+def tokenize(path):
+    JackTokenizer(path)
+
+
+def parse(path):
+    CompilationEngine(path, handler=NullHandler()).compile_class()
+
+
+def skim(path):
+    CompilationEngine(path, handler=NullHandler()).skim_class()
+
+
+def fit_exponent(sizes, values):
+    """Least-squares slope of log(value) against log(size)."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in values]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return covariance / variance
+
+
+def measure_time(stage, path):
+    best = None
+    total = 0
+    runs = 0
+    while runs < REPEATS or total < MIN_TOTAL_TIME:
+        start = time.perf_counter()
+        stage(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+        runs += 1
+    return best
+
+
+def measure_memory(stage, path):
+    tracemalloc.start()
+    try:
+        stage(path)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('stage', [tokenize, parse, skim])
+@pytest.mark.parametrize('generator', [huge_string, many_lines, single_line, deep_nesting, many_subroutines])
+def test_growth_is_linear(tmp_path, generator, stage):
+    sizes, times, peaks = [], [], []
+    for step in STEPS:
+        path = tmp_path / f'{generator.__name__}{step}.jack'
+        path.write_text(generator(step))
+        sizes.append(path.stat().st_size)
+        times.append(measure_time(stage, str(path)))
+        peaks.append(measure_memory(stage, str(path)))
+
+    time_exponent = fit_exponent(sizes, times)
+    memory_exponent = fit_exponent(sizes, peaks)
+    assert time_exponent < MAX_EXPONENT, f"time grows as size^{time_exponent:.2f}: {times}"
+    assert memory_exponent < MAX_EXPONENT, f"memory grows as size^{memory_exponent:.2f}: {peaks}"
+
+
+def write_if_statements(path, count):
+    """One optimized function with count if/else statements, each reading arrays twice."""
+    symbol_table = SymbolTable()
+    symbol_table.define('a', 'Array', 'var')
+    symbol_table.define('x', 'int', 'var')
+    writer = VMWriter(path, symbol_table, optimize=True)
+    writer.writeFunction('Main.main', 2)
+    for n in range(count):
+        for _ in range(2):
+            for command in ('push local 0', 'push local 1', 'add', 'pop pointer 1', 'push that 0'):
+                writer.writer(command)
+        writer.writeArithmetic('lt')
+        writer.writeArithmetic('not')
+        writer.writeIf(f'IF_FALSE{n}')
+        writer.writePush('constant', 1)
+        writer.writePop('local', 1)
+        writer.writeGoto(f'IF_END{n}')
+        writer.writeLabel(f'IF_FALSE{n}')
+        writer.writePush('constant', 2)
+        writer.writePop('local', 1)
+        writer.writeLabel(f'IF_END{n}')
+    writer.writePush('constant', 0)
+    writer.writeReturn()
+    writer.close()
+
+
+def test_vm_optimization_is_linear(tmp_path):
+    # 500 up to 4000 if/else statements in one function
+    sizes, times = [], []
+    for step in STEPS:
+        count = step * 500
+        path = str(tmp_path / f'Main{step}.vm')
+        best = None
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            write_if_statements(path, count)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        sizes.append(count)
+        times.append(best)
+
+    exponent = fit_exponent(sizes, times)
+    assert exponent < MAX_EXPONENT, f"time grows as size^{exponent:.2f}: {times}"
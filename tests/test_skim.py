@@ -0,0 +1,122 @@
+import time
+
+import pytest
+
+from CompilationEngine import CompilationEngine
+
+SOURCE = """
+class Main {
+    static int count;
+    field Array a, b;
+
+    constructor Main new(int n) {
+        let a = Array.new(n);
+        return this;
+    }
+
+    function void main() {
+        var int i;
+        while (i < 10) { if (i > 5) { let i = i + 2; } else { let i = i + 1; } }
+        return;
+    }
+
+    method int get(int j, boolean k) {
+        return a[j];
+    }
+}
+"""
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def start(self, tag):
+        self.events.append(('start', tag))
+
+    def end(self, tag):
+        self.events.append(('end', tag))
+
+    def token(self, kind, value):
+        self.events.append((kind, value))
+
+
+def engine_for(tmp_path, source):
+    path = tmp_path / 'Main.jack'
+    path.write_text(source)
+    return CompilationEngine(str(path), handler=Recorder())
+
+
+def test_skim_records_signatures(tmp_path):
+    engine = engine_for(tmp_path, SOURCE)
+    index = engine.skim_class()
+    assert index['name'] == 'Main'
+    assert index['class_vars'] == [('static', 'int', 'count'), ('field', 'Array', 'a'), ('field', 'Array', 'b')]
+    assert list(index['subroutines']) == ['new', 'main', 'get']
+    get = index['subroutines']['get']
+    assert (get['kind'], get['type']) == ('method', 'int')
+    assert get['parameters'] == [('int', 'j'), ('boolean', 'k')]
+    tokens = engine.tokenizer.listOfTokens
+    assert tokens[get['body'][0]] == '{' and tokens[get['body'][1]] == '}'
+    assert engine.handler.events == []
+
+
+def test_subroutine_compiled_alone_matches_full_parse(tmp_path):
+    full = engine_for(tmp_path, SOURCE)
+    full.compile_class()
+    events = full.handler.events
+    start = events.index(('keyword', 'method')) - 1
+    expected = events[start:start + events[start:].index(('end', 'subroutineDec')) + 1]
+
+    engine = engine_for(tmp_path, SOURCE)
+    engine.compile_subroutine_at('get')  # skims on demand
+    assert engine.handler.events == expected
+
+
+def test_body_compiled_alone(tmp_path):
+    engine = engine_for(tmp_path, SOURCE)
+    engine.skim_class()
+    engine.compile_subroutine_body_at('main')
+    events = engine.handler.events
+    assert events[0] == ('start', 'subroutineBody')
+    assert events[-1] == ('end', 'subroutineBody')
+
+
+def test_unknown_subroutine(tmp_path):
+    engine = engine_for(tmp_path, SOURCE)
+    with pytest.raises(Exception, match="no subroutine missing"):
+        engine.compile_subroutine_at('missing')
+
+
+@pytest.mark.parametrize('source', [
+    'class Main {\n function void f(int',
+    'class Main {\n function void f(int a) {\n return;',
+    'class Main function void f() { return; } }',
+])
+def test_truncated_or_malformed_input(tmp_path, source):
+    engine = engine_for(tmp_path, source)
+    with pytest.raises(Exception, match="end of input|Unbalanced|Expected"):
+        engine.skim_class()
+
+
+def test_skim_costs_a_fraction_of_a_full_parse(tmp_path):
+    subroutines = ''.join(
+        f'function int f{i}(int a, int b) {{ var int x; let x = a + b * {i}; '
+        f'while (x > 0) {{ let x = x - 1; }} return x; }}\n' for i in range(4000))
+    source = 'class A {\n' + subroutines + '}\n'
+
+    # Both start from the file path, so reading and tokenizing it counts for both
+    skim_time = parse_time = None
+    for _ in range(3):
+        start = time.perf_counter()
+        engine_for(tmp_path, source).skim_class()
+        elapsed = time.perf_counter() - start
+        skim_time = elapsed if skim_time is None else min(skim_time, elapsed)
+
+        start = time.perf_counter()
+        engine_for(tmp_path, source).compile_class()
+        elapsed = time.perf_counter() - start
+        parse_time = elapsed if parse_time is None else min(parse_time, elapsed)
+
+    # around 30% here
+    assert skim_time < 0.5 * parse_time, f"skim {skim_time:.3f}s vs parse {parse_time:.3f}s"
@@ -0,0 +1,126 @@
+import pytest
+
+from VMInterpreter import VMInterpreter
+
+FIB = """
+function Main.fib 0
+push argument 0
+push constant 2
+lt
+if-goto BASE
+push argument 0
+push constant 1
+sub
+call Main.fib 1
+push argument 0
+push constant 2
+sub
+call Main.fib 1
+add
+return
+label BASE
+push argument 0
+return
+"""
+
+SYS = """
+function Sys.init 0
+push constant 20
+call Main.fib 1
+call Output.printInt 1
+pop temp 0
+call Sys.halt 0
+"""
+
+
+def interpreter_for(*sources):
+    interpreter = VMInterpreter()
+    for source in sources:
+        interpreter.load_source(source)
+    return interpreter
+
+
+def test_recursive_fib():
+    stats = interpreter_for(FIB, SYS).run()
+    assert stats['output'] == '6765'
+    # fib(20) makes 21891 calls, each running 6 or 11 instructions
+    assert stats['calls']['Main.fib'] == 21891
+    assert stats['calls']['Sys.init'] == 1
+    assert stats['instructions'] == 240803
+    assert stats['function_instructions']['Main.fib'] == 240797
+
+
+def test_loads_files_and_directories(tmp_path):
+    (tmp_path / 'Main.vm').write_text(FIB)
+    (tmp_path / 'Sys.vm').write_text(SYS)
+    interpreter = VMInterpreter()
+    interpreter.load(str(tmp_path))
+    assert interpreter.run()['output'] == '6765'
+
+
+def test_runs_start_from_empty_memory():
+    interpreter = interpreter_for("""
+function Main.main 0
+push constant 5
+call String.new 1
+push constant 65
+call String.appendChar 2
+call Output.printString 1
+pop temp 0
+push constant 0
+return
+""")
+    first = interpreter.run()
+    second = interpreter.run()
+    assert first['output'] == second['output'] == 'A'
+    assert first['allocations'] == second['allocations'] == 1
+    assert first['instructions'] == second['instructions']
+
+
+def test_duplicate_label_is_rejected():
+    interpreter = interpreter_for("""
+function Main.main 0
+label LOOP
+label LOOP
+push constant 0
+return
+""")
+    with pytest.raises(Exception, match="defined twice"):
+        interpreter.run()
+
+
+def test_statics_are_scoped_by_class():
+    interpreter = interpreter_for("""
+function Main.main 0
+push constant 1
+pop static 0
+push constant 2
+call Other.set 1
+pop temp 0
+push static 0
+call Output.printInt 1
+pop temp 0
+push constant 0
+return
+""", """
+function Other.set 0
+push argument 0
+pop static 0
+push constant 0
+return
+""")
+    assert interpreter.run()['output'] == '1'
+
+
+def test_arithmetic_wraps_to_16_bits():
+    interpreter = interpreter_for("""
+function Main.main 0
+push constant 32767
+push constant 1
+add
+call Output.printInt 1
+pop temp 0
+push constant 0
+return
+""")
+    assert interpreter.run()['output'] == '-32768'
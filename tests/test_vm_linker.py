@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from VMInterpreter import VMInterpreter
+from VMLinker import VMBundle, VMLinker
+
+LINKER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'VMLinker.py')
+
+MAIN = """function Main.main 0
+push constant 7
+call Helper.double 1
+call Output.printInt 1
+pop temp 0
+push constant 0
+return
+"""
+
+HELPER = """function Helper.double 0
+push argument 0
+push argument 0
+add
+return
+"""
+
+SYS = """function Sys.init 0
+call Main.main 0
+pop temp 0
+call Sys.halt 0
+"""
+
+
+@pytest.fixture
+def classes(tmp_path):
+    directory = tmp_path / 'classes'
+    directory.mkdir()
+    for name, source in (('Main', MAIN), ('Helper', HELPER), ('Sys', SYS)):
+        (directory / f'{name}.vm').write_text(source)
+    return directory
+
+
+def link(directory, bundle_path):
+    linker = VMLinker()
+    for name in sorted(os.listdir(directory)):
+        linker.add_file(str(directory / name))
+    linker.write(str(bundle_path))
+
+
+def test_bundle_index_and_layout(tmp_path, classes):
+    bundle_path = tmp_path / 'program.vmb'
+    link(classes, bundle_path)
+    bundle = VMBundle(str(bundle_path))
+    try:
+        assert set(bundle.index) == {'Sys.init', 'Main.main', 'Helper.double'}
+        assert bundle.index['Helper.double'][0] == 'Helper'
+        assert bundle.function('Helper.double') == HELPER
+        assert bundle.source().startswith('function Sys.init 0\n')
+    finally:
+        bundle.close()
+
+    interpreter = VMInterpreter()
+    interpreter.load(str(bundle_path))
+    assert interpreter.run()['output'] == '14'
+
+
+def test_duplicate_function_is_rejected(tmp_path, classes):
+    (classes / 'Copy.vm').write_text(HELPER)
+    with pytest.raises(Exception, match="defined in both"):
+        link(classes, tmp_path / 'program.vmb')
+
+
+def test_relink_replaces_and_removes_classes(tmp_path, classes):
+    bundle_path = tmp_path / 'program.vmb'
+    (classes / 'Unused.vm').write_text("function Unused.f 0\npush constant 0\nreturn\n")
+    link(classes, bundle_path)
+
+    changed = tmp_path / 'Helper.vm'
+    changed.write_text(HELPER.replace('push argument 0\nadd', 'push constant 1\nadd'))
+    subprocess.run([sys.executable, LINKER, str(bundle_path), '--remove', 'Unused', str(changed)], check=True)
+
+    bundle = VMBundle(str(bundle_path))
+    try:
+        assert 'Unused.f' not in bundle.index
+    finally:
+        bundle.close()
+    interpreter = VMInterpreter()
+    interpreter.load(str(bundle_path))
+    assert interpreter.run()['output'] == '8'
+
+
+@pytest.mark.parametrize('content', [b'', b'VMBUNDLE x 0000000000 0\n', b'VMBUNDLE 1 0000000009 1\nbroken\n'])
+def test_invalid_bundle_is_rejected(tmp_path, content):
+    path = tmp_path / 'bad.vmb'
+    path.write_bytes(content)
+    with pytest.raises(Exception, match="Failed to read bundle"):
+        VMBundle(str(path))
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:-10],  # code cut short
+    lambda data: data + b'push constant 0\n',  # code no function owns
+    lambda data: data.replace(b' 3\n', b' 4\n', 1),  # function count disagrees with the index
+])
+def test_damaged_bundle_is_rejected(tmp_path, classes, damage):
+    path = tmp_path / 'program.vmb'
+    link(classes, path)
+    path.write_bytes(damage(path.read_bytes()))
+    with pytest.raises(Exception, match="Failed to read bundle"):
+        VMBundle(str(path))
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, classes, monkeypatch):
+    def fail(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        link(classes, tmp_path / 'program.vmb')
+    assert not (tmp_path / 'program.vmb.tmp').exists()
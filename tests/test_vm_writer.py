@@ -0,0 +1,288 @@
+import os
+import re
+import sys
+
+import pytest
+
+from symbolTable import SymbolTable
+from VMInterpreter import VMInterpreter
+from VMWriter import VMWriter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import bench_branches
+import bench_cse
+import bench_string_pool
+
+# A VM symbol: letters, digits, '_', '.' and ':', not starting with a digit
+VM_SYMBOL = re.compile(r'[A-Za-z_.:][A-Za-z0-9_.:]*')
+
+
+def run_program(tmp_path, build, optimize):
+    """Writes Main.main with build(writer) and returns the interpreter statistics."""
+    path = str(tmp_path / 'Main.vm')
+    writer = VMWriter(path, optimize=optimize)
+    writer.writeFunction('Main.main', 1)
+    build(writer)
+    writer.writePush('local', 0)
+    writer.writeCall('Output.printInt', 1)
+    writer.writePop('temp', 0)
+    writer.writePush('constant', 0)
+    writer.writeReturn()
+    writer.close()
+    interpreter = VMInterpreter()
+    interpreter.load(path)
+    return interpreter.run()
+
+
+def if_else(writer, condition):
+    """if (<condition>) { let c = 1; } else { let c = 2; }"""
+    condition(writer)
+    writer.writeArithmetic('not')
+    writer.writeIf('IF_FALSE0')
+    writer.writePush('constant', 1)
+    writer.writePop('local', 0)
+    writer.writeGoto('IF_END0')
+    writer.writeLabel('IF_FALSE0')
+    writer.writePush('constant', 2)
+    writer.writePop('local', 0)
+    writer.writeLabel('IF_END0')
+
+
+def while_loop(writer, condition):
+    """let c = 0; while (<condition>) { let c = c + 1; }"""
+    writer.writeLabel('WHILE_EXP0')
+    condition(writer)
+    writer.writeArithmetic('not')
+    writer.writeIf('WHILE_END0')
+    writer.writePush('local', 0)
+    writer.writePush('constant', 1)
+    writer.writeArithmetic('add')
+    writer.writePop('local', 0)
+    writer.writeGoto('WHILE_EXP0')
+    writer.writeLabel('WHILE_END0')
+
+
+def push_five(writer):
+    writer.writePush('constant', 5)
+
+
+def local_below_three(writer):
+    writer.writePush('local', 0)
+    writer.writePush('constant', 3)
+    writer.writeArithmetic('lt')
+
+
+def local_not_three(writer):
+    # ~(c = 3) on a non-boolean would be unsafe, (c = 3) then 'not' is a boolean
+    writer.writePush('local', 0)
+    writer.writePush('constant', 3)
+    writer.writeArithmetic('eq')
+    writer.writeArithmetic('not')
+
+
+@pytest.mark.parametrize('condition', [push_five, local_below_three])
+def test_if_keeps_its_meaning(tmp_path, condition):
+    plain = run_program(tmp_path, lambda writer: if_else(writer, condition), optimize=False)
+    optimized = run_program(tmp_path, lambda writer: if_else(writer, condition), optimize=True)
+    assert optimized['output'] == plain['output']
+
+
+@pytest.mark.parametrize('condition', [local_below_three, local_not_three])
+def test_while_keeps_its_meaning(tmp_path, condition):
+    plain = run_program(tmp_path, lambda writer: while_loop(writer, condition), optimize=False)
+    optimized = run_program(tmp_path, lambda writer: while_loop(writer, condition), optimize=True)
+    assert optimized['output'] == plain['output'] == '3'
+    assert optimized['instructions'] < plain['instructions']
+
+
+def test_non_boolean_condition_keeps_its_not(tmp_path):
+    path = str(tmp_path / 'Main.vm')
+    writer = VMWriter(path, optimize=True)
+    writer.writeFunction('Main.main', 1)
+    if_else(writer, push_five)
+    writer.writeReturn()
+    writer.close()
+    with open(path) as f:
+        assert 'push constant 5\nnot\nif-goto IF_FALSE0\n' in f.read()
+
+
+def test_generated_labels_never_collide(tmp_path):
+    def build(writer):
+        if_else(writer, local_below_three)
+        writer.writeLabel('IF_TRUE0')
+        writer.writeLabel('WHILE_BODY0')
+
+    run_program(tmp_path, build, optimize=True)  # the interpreter rejects duplicate labels
+    with open(tmp_path / 'Main.vm') as f:
+        labels = [line for line in f.read().split('\n') if line.startswith('label ')]
+    assert len(labels) == len(set(labels))
+
+
+def test_generated_symbols_are_legal(tmp_path):
+    path = str(tmp_path / 'Main.vm')
+    bench_branches.build(path, optimize=True)
+    with open(path) as f:
+        code = f.read()
+    bench_string_pool.build(path, pooled=True)
+    with open(path) as f:
+        code += f.read()
+    assert 'opt:' in code and 'Main.strings:init' in code
+    for line in code.split('\n'):
+        parts = line.split()
+        if parts and parts[0] in ('label', 'goto', 'if-goto', 'call', 'function'):
+            assert VM_SYMBOL.fullmatch(parts[1]), line
+
+
+def test_optimizations_are_opt_in(tmp_path):
+    path = str(tmp_path / 'Main.vm')
+    symbol_table = SymbolTable()
+    symbol_table.define('a', 'Array', 'var')
+    writer = VMWriter(path, symbol_table)
+    writer.writeFunction('Main.main', 1)
+    while_loop(writer, local_below_three)
+    writer.writeReturn()
+    writer.close()
+    with open(path) as f:
+        lines = f.read().split('\n')
+    assert lines[0] == 'function Main.main 1'
+    assert lines[1] == 'label WHILE_EXP0'
+    assert 'goto WHILE_EXP0' in lines
+
+
+def read_element(writer):
+    """a[i], with a in local 0 and i in local 1"""
+    writer.writePush('local', 0)
+    writer.writePush('local', 1)
+    writer.writeArithmetic('add')
+    writer.writePop('pointer', 1)
+    writer.writePush('that', 0)
+
+
+def store_element(writer):
+    """let a[i] = 20;"""
+    writer.writePush('local', 0)
+    writer.writePush('local', 1)
+    writer.writeArithmetic('add')
+    writer.writePush('constant', 20)
+    writer.writePop('temp', 0)
+    writer.writePop('pointer', 1)
+    writer.writePush('temp', 0)
+    writer.writePop('that', 0)
+
+
+def poke_element(writer):
+    """Memory.poke(a + i, 20), leaving its result on the stack"""
+    writer.writePush('local', 0)
+    writer.writePush('local', 1)
+    writer.writeArithmetic('add')
+    writer.writePush('constant', 20)
+    writer.writeCall('Memory.poke', 2)
+    writer.writeArithmetic('add')
+
+
+def cse_program(tmp_path, between, optimize):
+    """
+    var Array a; var int i; let a = Array.new(3); let i = 1; let a[1] = 10;
+    then prints a[i] + <between> + a[i], all in one block.
+    Returns the VM code and the output.
+    """
+    path = str(tmp_path / 'Main.vm')
+    symbol_table = SymbolTable()
+    symbol_table.define('a', 'Array', 'var')
+    symbol_table.define('i', 'int', 'var')
+    writer = VMWriter(path, symbol_table, optimize=optimize)
+    writer.writeFunction('Main.main', 2)
+    writer.writePush('constant', 3)
+    writer.writeCall('Array.new', 1)
+    writer.writePop('local', 0)
+    writer.writePush('constant', 1)
+    writer.writePop('local', 1)
+    writer.writePush('local', 0)
+    writer.writePop('pointer', 1)
+    writer.writePush('constant', 10)
+    writer.writePop('that', 1)
+    read_element(writer)
+    between(writer)
+    read_element(writer)
+    writer.writeArithmetic('add')
+    writer.writeCall('Output.printInt', 1)
+    writer.writePop('temp', 0)
+    writer.writePush('constant', 0)
+    writer.writeReturn()
+    writer.close()
+    interpreter = VMInterpreter()
+    interpreter.load(path)
+    with open(path) as f:
+        return f.read(), interpreter.run()['output']
+
+
+def test_repeated_array_read_is_cached(tmp_path):
+    code, output = cse_program(tmp_path, lambda writer: None, optimize=True)
+    assert output == '20'
+    assert code.count('push that 0') == 1
+    assert code.startswith('function Main.main 3\n')
+
+
+@pytest.mark.parametrize('between', [store_element, poke_element])
+def test_array_write_invalidates_cached_read(tmp_path, between):
+    plain_code, plain_output = cse_program(tmp_path, between, optimize=False)
+    code, output = cse_program(tmp_path, between, optimize=True)
+    assert output == plain_output
+    assert code == plain_code  # both reads stay, no hidden local is used
+
+
+def test_string_pool_benchmark(tmp_path):
+    plain = bench_string_pool.run(pooled=False)
+    pooled = bench_string_pool.run(pooled=True)
+    assert pooled['output'] == plain['output']
+    # one String per distinct literal plus the array holding them
+    assert pooled['allocations'] == len(bench_string_pool.LITERALS) + 1
+    assert plain['allocations'] == len(bench_string_pool.LITERALS) * bench_string_pool.ITERATIONS
+    assert pooled['instructions'] < plain['instructions']
+
+
+def test_pooling_more_literals_than_static_slots(tmp_path):
+    # The static segment has 240 words; pooling must not need one per literal
+    literals = [f"text {n}" for n in range(300)]
+    outputs = []
+    for pooled in (False, True):
+        path = str(tmp_path / 'Main.vm')
+        symbol_table = SymbolTable()
+        writer = VMWriter(path, symbol_table)
+        writer.writeFunction('Main.main', 0)
+        for _ in range(2):
+            for string in literals:
+                if pooled:
+                    writer.writeStringConstant(string)
+                else:
+                    bench_string_pool.write_literal(writer, string, pooled=False)
+                writer.writeCall('Output.printString', 1)
+                writer.writePop('temp', 0)
+        writer.writePush('constant', 0)
+        writer.writeReturn()
+        writer.close()
+        if pooled:
+            assert symbol_table.varCount('static') == 1
+        interpreter = VMInterpreter()
+        interpreter.load(path)
+        stats = interpreter.run()
+        outputs.append(stats['output'])
+        if pooled:
+            assert stats['allocations'] == len(literals) + 1
+    assert outputs[0] == outputs[1] == ''.join(literals) * 2
+
+
+def test_cse_benchmark():
+    plain = bench_cse.run(cached=False)
+    cached = bench_cse.run(cached=True)
+    assert cached['output'] == plain['output']
+    assert cached['instructions'] < plain['instructions']
+
+
+def test_branch_benchmark():
+    plain = bench_branches.run(optimize=False)
+    optimized = bench_branches.run(optimize=True)
+    assert optimized['output'] == plain['output']
+    assert optimized['instructions'] < plain['instructions']
+    assert optimized['cycles'] < plain['cycles']